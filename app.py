@@ -1,23 +1,53 @@
 from flask import Flask, render_template, request, session, send_file, redirect, url_for, flash, jsonify
+from flask_session import Session
 import os
 import pandas as pd
+import numpy as np
 from werkzeug.utils import secure_filename
 import zipfile
+import hashlib
+import importlib.util
+import glob
+import re
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font, Alignment
 import logging
 
+# Prefer the Rust calamine reader, otherwise let pandas pick openpyxl/xlrd
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec("python_calamine") is not None else None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
 app = Flask(__name__)
 app.secret_key = 'your_updated_secret_key_change_this'
 UPLOAD_FOLDER = 'uploads'
 RESULT_FOLDER = 'results'
+SESSION_FOLDER = 'sessions'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB limit
+DEEP_MEMORY_ROW_LIMIT = 50000  # Larger frames report shallow (approximate) memory usage
+
+# Whitespace handling for normalization, the RE2 pattern matches the same characters as Python's \s
+WHITESPACE_RE = re.compile(r'\s+')
+WHITESPACE_RE2 = r'[\s\v\p{Z}\x{1c}-\x{1f}\x{85}]+'
+NULL_TOKENS = ['nan', 'none', '', 'null']
 
 # Create directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULT_FOLDER, exist_ok=True)
+os.makedirs(SESSION_FOLDER, exist_ok=True)
+
+# Let Werkzeug reject oversized uploads before anything is written
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+
+# Keep session state on the server, only the session id travels in the cookie
+app.config['SESSION_TYPE'] = 'filesystem'
+app.config['SESSION_FILE_DIR'] = SESSION_FOLDER
+Session(app)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -38,30 +68,191 @@ def get_file_info(filepath):
     except:
         return {'size': 'Unknown', 'modified': 'Unknown', 'name': 'Unknown'}
 
+def optimize_dtypes(df, category_ratio=0.5):
+    """Downcast numeric columns and convert low-cardinality text to category"""
+    for col in df.columns:
+        col_data = df[col]
+
+        if pd.api.types.is_integer_dtype(col_data.dtype) and not pd.api.types.is_bool_dtype(col_data.dtype):
+            if col_data.empty:
+                continue
+            col_min, col_max = col_data.min(), col_data.max()
+            if col_min >= 0:
+                candidates = [np.uint8, np.uint16, np.uint32, np.uint64]
+            else:
+                candidates = [np.int8, np.int16, np.int32, np.int64]
+            for int_type in candidates:
+                if np.iinfo(int_type).min <= col_min and col_max <= np.iinfo(int_type).max:
+                    df[col] = col_data.astype(int_type)
+                    break
+
+        elif pd.api.types.is_float_dtype(col_data.dtype) and col_data.dtype != np.float32:
+            # Only downcast when every value survives the round trip, reports must keep the original values
+            downcast = col_data.astype(np.float32)
+            if (downcast.astype(col_data.dtype) == col_data).sum() == col_data.count():
+                df[col] = downcast
+
+        elif col_data.dtype == 'object' and len(df) > 0:
+            if col_data.nunique() / len(df) <= category_ratio:
+                df[col] = col_data.astype('category')
+
+    return df
+
+def get_file_hash(filepath):
+    """Build a cache key from the file path and its modification time"""
+    key = f"{os.path.abspath(filepath)}:{os.path.getmtime(filepath)}"
+    return hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+
+def read_csv_file(filepath, nrows=None):
+    """Read a CSV, retrying with latin-1 when the file is not valid UTF-8"""
+    try:
+        return pd.read_csv(filepath, nrows=nrows, encoding='utf-8')
+    except UnicodeDecodeError:
+        return pd.read_csv(filepath, nrows=nrows, encoding='latin-1')
+
+def clear_sheet_cache():
+    """Remove cached sheet and normalized files belonging to the current session"""
+    cache = session.pop("sheet_cache", None)
+    if not cache:
+        return
+
+    for path in glob.glob(os.path.join(RESULT_FOLDER, f"{cache['hash']}_*")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Error removing cached file {path}: {e}")
+
+def write_cache_frame(df, base_path):
+    """Store a frame as parquet, or pickle when pyarrow can't represent it"""
+    cache_path = f"{base_path}.parquet"
+    try:
+        df.to_parquet(cache_path, engine='pyarrow', index=False)
+    except Exception as e:
+        # Mixed-type object columns can't be stored as parquet, fall back to pickle
+        logger.info(f"Parquet cache unavailable for {os.path.basename(base_path)}, using pickle: {e}")
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        cache_path = f"{base_path}.pkl"
+        df.to_pickle(cache_path)
+    return cache_path
+
+def get_cached_sheets(filepath, file_hash=None):
+    """Return the cached sheet paths for a file, or None if the cache is stale"""
+    file_hash = file_hash or get_file_hash(filepath)
+    cache = session.get("sheet_cache")
+    if cache and cache.get('hash') == file_hash:
+        return {name: path for name, path in cache['sheets'].items() if os.path.exists(path)}
+    return None
+
+def load_sheet(filepath, sheet_name=None):
+    """Load one sheet (first sheet if unknown), parsing it only on first request"""
+    file_hash = get_file_hash(filepath)
+    cache = session.get("sheet_cache")
+    if not cache or cache.get('hash') != file_hash:
+        # File changed or was re-uploaded, drop stale cache files
+        clear_sheet_cache()
+        cache = {'hash': file_hash, 'sheet_names': None, 'sheets': {}}
+
+    is_csv = filepath.lower().endswith('.csv')
+    excel_file = None
+    try:
+        if cache['sheet_names'] is None:
+            if is_csv:
+                cache['sheet_names'] = ['Sheet1']
+            else:
+                # Only the workbook index is read here, sheets are parsed on demand
+                excel_file = pd.ExcelFile(filepath, engine=EXCEL_ENGINE)
+                cache['sheet_names'] = [str(name) for name in excel_file.sheet_names]
+
+        sheet_names = cache['sheet_names']
+        if not sheet_name or sheet_name not in sheet_names:
+            sheet_name = sheet_names[0]
+
+        cache_path = cache['sheets'].get(sheet_name)
+        if cache_path and os.path.exists(cache_path):
+            df = load_cached_sheet(cache_path)
+        else:
+            if is_csv:
+                df = read_csv_file(filepath)
+            else:
+                if excel_file is None:
+                    excel_file = pd.ExcelFile(filepath, engine=EXCEL_ENGINE)
+                df = excel_file.parse(sheet_name)
+
+            # Parquet requires string column names
+            df.columns = df.columns.astype(str)
+            df = optimize_dtypes(df)
+            base_path = os.path.join(RESULT_FOLDER, f"{file_hash}_{sheet_names.index(sheet_name)}")
+            cache['sheets'][sheet_name] = write_cache_frame(df, base_path)
+    finally:
+        if excel_file is not None:
+            excel_file.close()
+
+    session["sheet_cache"] = cache
+    return sheet_names, sheet_name, df
+
+def load_cached_sheet(cache_path):
+    """Load a sheet previously stored by load_sheet"""
+    if cache_path.endswith('.parquet'):
+        return pd.read_parquet(cache_path, engine='pyarrow')
+    return pd.read_pickle(cache_path)
+
+def load_preview_sheet(filepath, sheet, nrows=20):
+    """Load the first rows of a sheet, parsing only those rows when nothing is cached"""
+    sheet_cache = get_cached_sheets(filepath) or {}
+    if filepath.lower().endswith('.csv'):
+        sheet = 'Sheet1'
+    if sheet in sheet_cache:
+        return load_cached_sheet(sheet_cache[sheet]).head(nrows)
+
+    if filepath.lower().endswith('.csv'):
+        # Same parser and NA handling as the full load in load_sheet
+        df = read_csv_file(filepath, nrows=nrows)
+    else:
+        df = pd.read_excel(filepath, sheet_name=sheet, nrows=nrows, engine=EXCEL_ENGINE)
+
+    df.columns = df.columns.astype(str)
+    return df
+
 def analyze_data_quality(df):
     """Enhanced data quality analysis"""
+    # Gather per-column counts in a single pass each and reuse them below
+    null_counts = df.isnull().sum()
+    total_nulls = int(null_counts.sum())
+    distinct_counts = df.nunique(dropna=False)
+
+    # Deep memory usage walks every string object, only worth it on small frames
+    memory_is_shallow = len(df) >= DEEP_MEMORY_ROW_LIMIT
+    memory_usage = f"{df.memory_usage(deep=not memory_is_shallow).sum() / 1024:.2f} KB"
+    if memory_is_shallow:
+        memory_usage += " (approx.)"
+
     analysis = {
         'total_rows': len(df),
         'total_columns': len(df.columns),
-        'memory_usage': f"{df.memory_usage(deep=True).sum() / 1024:.2f} KB",
-        'blank_cells': int(df.isnull().sum().sum()),
-        'blank_percentage': round((df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100, 2) if len(df) > 0 else 0,
-        'data_types': df.dtypes.value_counts().to_dict(),
+        'memory_usage': memory_usage,
+        'memory_is_shallow': memory_is_shallow,
+        'blank_cells': total_nulls,
+        'blank_percentage': round((total_nulls / (len(df) * len(df.columns))) * 100, 2) if len(df) > 0 else 0,
+        'data_types': df.dtypes.astype(str).value_counts().to_dict(),
         'column_stats': {}
     }
 
     # Analyze each column
-    for col in df.columns:
+    for i, col in enumerate(df.columns):
+        null_count = int(null_counts.iloc[i])
+        distinct_count = int(distinct_counts.iloc[i])
         col_stats = {
-            'dtype': str(df[col].dtype),
-            'non_null_count': int(df[col].count()),
-            'null_count': int(df[col].isnull().sum()),
-            'unique_values': int(df[col].nunique()),
-            'duplicates_in_column': int(df[col].duplicated().sum())
+            'dtype': str(df.dtypes.iloc[i]),
+            'non_null_count': len(df) - null_count,
+            'null_count': null_count,
+            # nunique(dropna=False) counts NaN as one value, duplicated() treats NaNs as equal
+            'unique_values': distinct_count - (1 if null_count > 0 else 0),
+            'duplicates_in_column': len(df) - distinct_count
         }
 
         # Add sample values for object columns
-        if df[col].dtype == 'object' and not df[col].empty:
+        if (df[col].dtype == 'object' or isinstance(df[col].dtype, pd.CategoricalDtype)) and not df[col].empty:
             try:
                 sample_values = df[col].dropna().astype(str).unique()[:3].tolist()
                 col_stats['sample_values'] = sample_values
@@ -72,26 +263,30 @@ def analyze_data_quality(df):
 
     return analysis
 
-def highlight_duplicates(df, subset, duplicate_type='all'):
+def highlight_duplicates(df, subset, duplicate_type='all', dup_mask=None):
     """Enhanced duplicate highlighting with better styling"""
-    df_copy = df.copy()
-
-    if duplicate_type == 'all':
-        dup_mask = df_copy.duplicated(subset=subset, keep=False)
+    if dup_mask is not None:
+        # Reuse the mask from the full analysis instead of recomputing it on the preview rows
+        dup_mask = np.asarray(dup_mask, dtype=bool)
     elif duplicate_type == 'except_first':
-        dup_mask = df_copy.duplicated(subset=subset, keep='first')
+        dup_mask = df.duplicated(subset=subset, keep='first').to_numpy()
     elif duplicate_type == 'except_last':
-        dup_mask = df_copy.duplicated(subset=subset, keep='last')
+        dup_mask = df.duplicated(subset=subset, keep='last').to_numpy()
     else:
-        dup_mask = df_copy.duplicated(subset=subset, keep=False)
+        dup_mask = df.duplicated(subset=subset, keep=False).to_numpy()
 
-    def highlight_row(row):
-        if dup_mask[row.name]:
-            return ['background-color: #fff3cd; border-left: 3px solid #ffc107; font-weight: bold;' for _ in row]
-        else:
-            return ['background-color: #f8f9fa;' for _ in row]
+    # Build the whole style grid in one broadcast instead of once per row
+    styles = np.where(
+        dup_mask[:, None],
+        'background-color: #fff3cd; border-left: 3px solid #ffc107; font-weight: bold;',
+        'background-color: #f8f9fa;'
+    )
+    styles = np.broadcast_to(styles, (len(df), len(df.columns)))
 
-    styled = df_copy.style.apply(highlight_row, axis=1)
+    def highlight_rows(data):
+        return pd.DataFrame(styles, index=data.index, columns=data.columns)
+
+    styled = df.style.apply(highlight_rows, axis=None)
     styled = styled.set_table_styles([
         {'selector': 'th', 'props': [('background-color', '#007bff'), ('color', 'white'), ('font-weight', 'bold')]},
         {'selector': 'td', 'props': [('padding', '8px'), ('border', '1px solid #dee2e6')]},
@@ -100,25 +295,35 @@ def highlight_duplicates(df, subset, duplicate_type='all'):
 
     return styled.to_html()
 
+def normalize_text_column(series):
+    """Strip, lowercase and collapse whitespace in a text column"""
+    values = series.astype(str)
+
+    if pc is not None:
+        # Arrow string kernels run in C instead of pandas' per-cell object path
+        arr = pa.array(values, type=pa.string())
+        arr = pc.utf8_lower(pc.utf8_trim_whitespace(arr))
+        arr = pc.replace_substring_regex(arr, pattern=WHITESPACE_RE2, replacement=' ')
+        arr = pc.if_else(pc.is_in(arr, value_set=pa.array(NULL_TOKENS)), pa.scalar(None, pa.string()), arr)
+        return pd.Series(arr.to_numpy(zero_copy_only=False), index=series.index, name=series.name)
+
+    # Convert to string, strip whitespace, convert to lowercase
+    values = values.str.strip().str.lower()
+    # Replace multiple spaces with single space
+    values = values.str.replace(WHITESPACE_RE, ' ', regex=True)
+    # Handle common variations
+    return values.replace({token: pd.NA for token in NULL_TOKENS})
+
 def normalize_data_for_comparison(df, columns):
     """Normalize data for better duplicate detection"""
-    df_normalized = df.copy()
+    # Only the compared columns are needed, leave the rest of the frame untouched
+    df_normalized = df[[col for col in columns if col in df.columns]].copy()
 
     for col in columns:
         if col in df_normalized.columns:
             # Handle string columns
-            if df_normalized[col].dtype == 'object':
-                # Convert to string, strip whitespace, convert to lowercase
-                df_normalized[col] = df_normalized[col].astype(str).str.strip().str.lower()
-                # Replace multiple spaces with single space
-                df_normalized[col] = df_normalized[col].str.replace(r'\s+', ' ', regex=True)
-                # Handle common variations
-                df_normalized[col] = df_normalized[col].replace({
-                    'nan': pd.NA,
-                    'none': pd.NA,
-                    '': pd.NA,
-                    'null': pd.NA
-                })
+            if df_normalized[col].dtype == 'object' or isinstance(df_normalized[col].dtype, pd.CategoricalDtype):
+                df_normalized[col] = normalize_text_column(df_normalized[col])
 
             # Handle numeric columns
             elif df_normalized[col].dtype in ['float64', 'float32']:
@@ -127,105 +332,123 @@ def normalize_data_for_comparison(df, columns):
 
     return df_normalized
 
+def load_normalized_subset(filepath, sheet_name, df, columns):
+    """Normalize the compared columns, reusing a cached result for the same file, sheet and columns"""
+    subset_key = hashlib.md5(repr((sheet_name, tuple(sorted(columns)))).encode('utf-8')).hexdigest()[:16]
+    base_path = os.path.join(RESULT_FOLDER, f"{get_file_hash(filepath)}_norm_{subset_key}")
+
+    for cache_path in (f"{base_path}.parquet", f"{base_path}.pkl"):
+        if os.path.exists(cache_path):
+            df_normalized = load_cached_sheet(cache_path)
+            df_normalized.index = df.index
+            return df_normalized
+
+    df_normalized = normalize_data_for_comparison(df, columns)
+    write_cache_frame(df_normalized, base_path)
+    return df_normalized
+
+def compute_duplicate_mask(row_hashes, duplicate_type):
+    """Build a single duplicate mask from precomputed row hashes"""
+    if duplicate_type == 'except_first':
+        return row_hashes.duplicated(keep='first')
+    elif duplicate_type == 'except_last':
+        return row_hashes.duplicated(keep='last')
+    else:
+        return row_hashes.duplicated(keep=False)
+
+def find_duplicate_rows(df_normalized, columns, duplicate_type='all'):
+    """Flag duplicate rows using one hash per row over the selected columns"""
+    # Hash each column once and combine into a single uint64 per row
+    row_hashes = pd.util.hash_pandas_object(df_normalized[columns], index=False)
+    return compute_duplicate_mask(row_hashes, duplicate_type)
+
 def create_enhanced_reports(original_df, duplicates_df, cleaned_df, selected_columns, analysis, duplicate_type):
     """Create comprehensive Excel reports with formatting"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # File paths
-    original_path = os.path.join(RESULT_FOLDER, f"Original_Data_{timestamp}.xlsx")
-    duplicates_path = os.path.join(RESULT_FOLDER, f"Duplicates_Only_{timestamp}.xlsx")
-    cleaned_path = os.path.join(RESULT_FOLDER, f"Cleaned_Data_{timestamp}.xlsx")
-    summary_path = os.path.join(RESULT_FOLDER, f"Analysis_Summary_{timestamp}.xlsx")
-
-    # Create summary report
-    with pd.ExcelWriter(summary_path, engine="openpyxl") as writer:
-        # Summary sheet
-        summary_data = {
-            'Metric': [
-                'Analysis Date',
-                'Total Rows',
-                'Total Columns',
-                'Duplicate Rows Found',
-                'Cleaned Rows Remaining',
-                'Removal Rate (%)',
-                'Blank Cells',
-                'Blank Percentage (%)',
-                'Analysis Columns',
-                'Duplicate Detection Type',
-                'Memory Usage'
-            ],
-            'Value': [
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                analysis['total_rows'],
-                analysis['total_columns'],
-                len(duplicates_df),
-                len(cleaned_df),
-                round((len(duplicates_df) / analysis['total_rows'] * 100), 2) if analysis['total_rows'] > 0 else 0,
-                analysis['blank_cells'],
-                analysis['blank_percentage'],
-                ', '.join(selected_columns),
-                duplicate_type.replace('_', ' ').title(),
-                analysis['memory_usage']
-            ]
-        }
-        pd.DataFrame(summary_data).to_excel(writer, sheet_name="Summary", index=False)
-
-        # Column analysis
-        col_analysis = []
-        for col, stats in analysis['column_stats'].items():
-            col_analysis.append({
-                'Column Name': col,
-                'Data Type': stats['dtype'],
-                'Non-Null Count': stats['non_null_count'],
-                'Null Count': stats['null_count'],
-                'Unique Values': stats['unique_values'],
-                'Column Duplicates': stats['duplicates_in_column'],
-                'Sample Values': ', '.join(stats.get('sample_values', []))[:50] + '...' if len(', '.join(stats.get('sample_values', []))) > 50 else ', '.join(stats.get('sample_values', []))
-            })
-        pd.DataFrame(col_analysis).to_excel(writer, sheet_name="Column Analysis", index=False)
-
-    # Save individual files
-    with pd.ExcelWriter(original_path, engine="openpyxl") as writer:
-        original_df.to_excel(writer, sheet_name="Original Data", index=False)
-
-    if not duplicates_df.empty:
-        with pd.ExcelWriter(duplicates_path, engine="openpyxl") as writer:
-            duplicates_df.to_excel(writer, sheet_name="Duplicate Rows", index=False)
-
-        # Format duplicates file with highlighting
-        wb = load_workbook(duplicates_path)
-        ws = wb["Duplicate Rows"]
-        yellow_fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")
-        header_fill = PatternFill(start_color="007BFF", end_color="007BFF", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True)
-
-        # Format header
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center")
-
-        # Format data rows
-        for row in ws.iter_rows(min_row=2):
-            for cell in row:
-                cell.fill = yellow_fill
-
-        wb.save(duplicates_path)
-
-    with pd.ExcelWriter(cleaned_path, engine="openpyxl") as writer:
-        cleaned_df.to_excel(writer, sheet_name="Cleaned Data", index=False)
-
-    # Create ZIP file
+    # Write each report straight into the ZIP instead of staging it on disk first
     zip_path = os.path.join(RESULT_FOLDER, f"Duplicate_Analysis_Report_{timestamp}.zip")
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(summary_path, f"Analysis_Summary_{timestamp}.xlsx")
-        zipf.write(original_path, f"Original_Data_{timestamp}.xlsx")
+        # Create summary report
+        with zipf.open(f"Analysis_Summary_{timestamp}.xlsx", 'w') as fh, pd.ExcelWriter(fh, engine="xlsxwriter") as writer:
+            # Summary sheet
+            summary_data = {
+                'Metric': [
+                    'Analysis Date',
+                    'Total Rows',
+                    'Total Columns',
+                    'Duplicate Rows Found',
+                    'Cleaned Rows Remaining',
+                    'Removal Rate (%)',
+                    'Blank Cells',
+                    'Blank Percentage (%)',
+                    'Analysis Columns',
+                    'Duplicate Detection Type',
+                    'Memory Usage'
+                ],
+                'Value': [
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    analysis['total_rows'],
+                    analysis['total_columns'],
+                    len(duplicates_df),
+                    len(cleaned_df),
+                    round((len(duplicates_df) / analysis['total_rows'] * 100), 2) if analysis['total_rows'] > 0 else 0,
+                    analysis['blank_cells'],
+                    analysis['blank_percentage'],
+                    ', '.join(selected_columns),
+                    duplicate_type.replace('_', ' ').title(),
+                    analysis['memory_usage']
+                ]
+            }
+            pd.DataFrame(summary_data).to_excel(writer, sheet_name="Summary", index=False)
+
+            # Column analysis
+            col_analysis = []
+            for col, stats in analysis['column_stats'].items():
+                col_analysis.append({
+                    'Column Name': col,
+                    'Data Type': stats['dtype'],
+                    'Non-Null Count': stats['non_null_count'],
+                    'Null Count': stats['null_count'],
+                    'Unique Values': stats['unique_values'],
+                    'Column Duplicates': stats['duplicates_in_column'],
+                    'Sample Values': ', '.join(stats.get('sample_values', []))[:50] + '...' if len(', '.join(stats.get('sample_values', []))) > 50 else ', '.join(stats.get('sample_values', []))
+                })
+            pd.DataFrame(col_analysis).to_excel(writer, sheet_name="Column Analysis", index=False)
+
+        # Save individual files
+        with zipf.open(f"Original_Data_{timestamp}.xlsx", 'w') as fh, pd.ExcelWriter(fh, engine="xlsxwriter") as writer:
+            original_df.to_excel(writer, sheet_name="Original Data", index=False)
+
         if not duplicates_df.empty:
-            zipf.write(duplicates_path, f"Duplicates_Only_{timestamp}.xlsx")
-        zipf.write(cleaned_path, f"Cleaned_Data_{timestamp}.xlsx")
+            with zipf.open(f"Duplicates_Only_{timestamp}.xlsx", 'w') as fh, pd.ExcelWriter(fh, engine="xlsxwriter") as writer:
+                # Fill every data cell as it is written, merged with pandas' own date/number formats
+                duplicates_df.style.set_properties(**{'background-color': '#FFF3CD'}).to_excel(
+                    writer, sheet_name="Duplicate Rows", index=False
+                )
+
+                # Format header
+                workbook = writer.book
+                worksheet = writer.sheets["Duplicate Rows"]
+                header_format = workbook.add_format({
+                    'bg_color': '#007BFF',
+                    'font_color': '#FFFFFF',
+                    'bold': True,
+                    'align': 'center'
+                })
+                for col_num, col_name in enumerate(duplicates_df.columns):
+                    worksheet.write(0, col_num, str(col_name), header_format)
+
+        with zipf.open(f"Cleaned_Data_{timestamp}.xlsx", 'w') as fh, pd.ExcelWriter(fh, engine="xlsxwriter") as writer:
+            cleaned_df.to_excel(writer, sheet_name="Cleaned Data", index=False)
 
     return zip_path
 
+@app.errorhandler(413)
+def file_too_large(e):
+    error_msg = f"File too large. Maximum size is {MAX_FILE_SIZE/(1024*1024):.0f}MB."
+    return render_template("index.html", error_msg=error_msg), 413
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     sheet_names = []
@@ -256,18 +479,10 @@ def index():
                 error_msg = "Please upload a valid Excel file (.xlsx, .xls) or CSV file."
                 return render_template("index.html", error_msg=error_msg)
 
-            # Check file size
-            uploaded_file.seek(0, os.SEEK_END)
-            file_size = uploaded_file.tell()
-            uploaded_file.seek(0)
-
-            if file_size > MAX_FILE_SIZE:
-                error_msg = f"File too large. Maximum size is {MAX_FILE_SIZE/(1024*1024):.0f}MB."
-                return render_template("index.html", error_msg=error_msg)
-
             filename = secure_filename(uploaded_file.filename)
             filepath = os.path.join(UPLOAD_FOLDER, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}")
             uploaded_file.save(filepath)
+            clear_sheet_cache()
             session["file_path"] = filepath
             file_uploaded = True
             success_msg = f"File '{filename}' uploaded successfully!"
@@ -280,30 +495,14 @@ def index():
         try:
             file_info = get_file_info(filepath)
 
-            # Read file based on extension
-            if filepath.lower().endswith('.csv'):
-                # Handle CSV files
-                try:
-                    df = pd.read_csv(filepath, encoding='utf-8')
-                    sheet_names = ['Sheet1']
-                    selected_sheet = 'Sheet1'
-                except UnicodeDecodeError:
-                    try:
-                        df = pd.read_csv(filepath, encoding='latin-1')
-                        sheet_names = ['Sheet1']
-                        selected_sheet = 'Sheet1'
-                    except Exception as e:
-                        error_msg = f"Error reading CSV file: {str(e)}"
-                        return render_template("index.html", error_msg=error_msg, file_uploaded=file_uploaded)
-            else:
-                # Handle Excel files
-                sheet_data = pd.read_excel(filepath, sheet_name=None)
-                sheet_names = list(sheet_data.keys())
-
-                if not selected_sheet or selected_sheet not in sheet_names:
-                    selected_sheet = sheet_names[0]
-
-                df = sheet_data[selected_sheet]
+            # Load the selected sheet from cache, parsing it only on first use
+            try:
+                sheet_names, selected_sheet, df = load_sheet(filepath, selected_sheet)
+            except Exception as e:
+                if filepath.lower().endswith('.csv'):
+                    error_msg = f"Error reading CSV file: {str(e)}"
+                    return render_template("index.html", error_msg=error_msg, file_uploaded=file_uploaded)
+                raise
 
             # Data validation
             if df.empty:
@@ -328,20 +527,13 @@ def index():
             if valid_columns:
                 try:
                     # Normalize data for better duplicate detection
-                    df_normalized = normalize_data_for_comparison(df, valid_columns)
+                    df_normalized = load_normalized_subset(filepath, selected_sheet, df, valid_columns)
 
                     # Find duplicates based on type
-                    if duplicate_type == 'all':
-                        mask = df_normalized.duplicated(subset=valid_columns, keep=False)
-                    elif duplicate_type == 'except_first':
-                        mask = df_normalized.duplicated(subset=valid_columns, keep='first')
-                    elif duplicate_type == 'except_last':
-                        mask = df_normalized.duplicated(subset=valid_columns, keep='last')
-                    else:
-                        mask = df_normalized.duplicated(subset=valid_columns, keep=False)
+                    mask = find_duplicate_rows(df_normalized, valid_columns, duplicate_type)
 
-                    duplicates = df[mask].copy()  # Use original data for display
-                    cleaned_df = df[~mask].copy()
+                    duplicates = df[mask]  # Use original data for display
+                    cleaned_df = df[~mask]
 
                     # Generate HTML for display
                     if not duplicates.empty:
@@ -355,7 +547,7 @@ def index():
                         success_msg = "Great! No duplicates found with the selected criteria."
 
                     # Generate preview with highlighting
-                    sheet_preview_html = highlight_duplicates(df.head(20), valid_columns, duplicate_type)
+                    sheet_preview_html = highlight_duplicates(df.head(20), valid_columns, duplicate_type, dup_mask=mask.iloc[:20])
 
                     # Update data stats
                     data_stats = {
@@ -376,7 +568,7 @@ def index():
                     logger.error(f"Duplicate analysis error: {e}")
             else:
                 # Show preview without analysis
-                sheet_preview_html = df.head(20).style.set_table_attributes('class="table table-striped table-sm"').to_html()
+                sheet_preview_html = df.head(20).to_html(classes="table table-striped table-sm", index=False, escape=True)
                 if selected_columns:
                     error_msg = "Selected columns not found in the data. Please check column names."
 
@@ -422,6 +614,7 @@ def reset():
             download_path = session["download_path"]
             if os.path.exists(download_path):
                 os.remove(download_path)
+        clear_sheet_cache()
     except Exception as e:
         logger.error(f"Error cleaning up files: {e}")
 
@@ -440,15 +633,12 @@ def api_preview():
         sheet = request.args.get("sheet", "Sheet1")
         columns = request.args.getlist("columns[]")
 
-        if filepath.lower().endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath, sheet_name=sheet)
+        df = load_preview_sheet(filepath, sheet)
 
         if columns:
             valid_columns = [col for col in columns if col in df.columns]
             if valid_columns:
-                preview_data = df[valid_columns].head(5).fillna('').to_dict('records')
+                preview_data = df[valid_columns].head(5).astype(object).fillna('').to_dict('records')
                 return jsonify({"preview": preview_data, "columns": valid_columns})
 
         return jsonify({"preview": [], "columns": []})